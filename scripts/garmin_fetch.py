@@ -3,9 +3,10 @@
 Garmin Connect GPX fetcher for water sport activities.
 
 Usage:
-    python garmin_fetch.py list [--days N]
-    python garmin_fetch.py fetch <activity_id> [--output DIR]
-    python garmin_fetch.py fetch-all [--days N] [--output DIR]
+    python garmin_fetch.py list [--days N] [--cache-ttl SECONDS]
+    python garmin_fetch.py fetch <activity_id> [--output DIR] [--force]
+    python garmin_fetch.py fetch-all [--days N] [--output DIR] [--workers N] [--force]
+                                     [--cache-ttl SECONDS] [--compress {none,gzip}]
     python garmin_fetch.py validate
 
 Environment variables:
@@ -19,10 +20,14 @@ Credentials may also be supplied via stdin as a single JSON line:
 """
 
 import argparse
+import contextlib
+import hashlib
 import json
 import os
 import re
 import sys
+import time
+from dataclasses import asdict, dataclass, is_dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -30,7 +35,9 @@ from pathlib import Path
 # not at module load. This keeps the pure-Python filter helpers
 # (is_water_sport, name_matches_water_sport, WATER_SPORT_NAME_PATTERN)
 # importable from tests without requiring garminconnect to be installed
-# in the test environment.
+# in the test environment. The same goes for the thread pool, orjson,
+# gzip and random: they are only imported by the code paths that use
+# them, so `--help`, `validate` and friends start without paying for them.
 def _import_garmin():
     try:
         from garminconnect import (
@@ -43,6 +50,26 @@ def _import_garmin():
         sys.exit(1)
 
 
+def _json_default(obj):
+    if is_dataclass(obj):
+        return asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj):
+    """Encode obj (which may contain Activity records) as a JSON string,
+    via orjson when available.
+
+    orjson is optional; it is several times faster than the stdlib on
+    large fetch-all/list output and serializes dataclasses natively.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(obj, default=_json_default)
+    return orjson.dumps(obj).decode()
+
+
 def get_credentials_from_stdin():
     """Try to read credentials from stdin JSON.
 
@@ -75,14 +102,15 @@ WATER_SPORTS_PARENT_TYPE_ID = 228
 GENERIC_FITNESS_PARENT_TYPE_ID = 17
 
 # Legacy typeKeys filed under other parent IDs that we also want to capture.
-LEGACY_WATER_SPORT_TYPES = {
+# A frozenset: hashed membership tests, and nothing can mutate it at runtime.
+LEGACY_WATER_SPORT_TYPES = frozenset({
     "kayaking",
     "paddling",
     "canoeing",
     "rowing",
     "stand_up_paddleboarding",
     "whitewater_rafting_kayaking",
-}
+})
 
 # Case-insensitive patterns used by the opt-in name-fallback.
 #
@@ -120,11 +148,10 @@ WATER_SPORT_NAME_PATTERN = re.compile(
 
 def is_water_sport(activity):
     """Check if an activity is a water sport via parentTypeId or legacy typeKey."""
-    parent_id = activity.get("activityType", {}).get("parentTypeId")
-    if parent_id == WATER_SPORTS_PARENT_TYPE_ID:
+    atype = activity.get("activityType") or {}
+    if atype.get("parentTypeId") == WATER_SPORTS_PARENT_TYPE_ID:
         return True
-    type_key = activity.get("activityType", {}).get("typeKey", "")
-    return type_key in LEGACY_WATER_SPORT_TYPES
+    return atype.get("typeKey", "") in LEGACY_WATER_SPORT_TYPES
 
 
 def name_matches_water_sport(activity):
@@ -148,13 +175,32 @@ def load_config():
         Path.home() / ".config" / "efb-connector" / "config.json",
     ]
 
+    # Open directly rather than exists() + open(): one syscall per
+    # candidate, and no window for the file to vanish in between.
     for path in config_paths:
-        if path.exists():
+        try:
             with open(path) as f:
                 return json.load(f)
+        except FileNotFoundError:
+            continue
     return {}
 
 
+def _op_field_value(fields, name):
+    """Return the value of the 1Password item field whose label or id is
+    `name`. Like `op read op://vault/item/<section>/<field>`, `name` may be
+    qualified with the section label or id, e.g. "Login/username"."""
+    section, _, name = name.rpartition("/")
+    for field in fields:
+        if name not in (field.get("label"), field.get("id")):
+            continue
+        field_section = field.get("section") or {}
+        if section and section not in (field_section.get("label"), field_section.get("id")):
+            continue
+        return (field.get("value") or "").strip()
+    return ""
+
+
 def get_credentials(config):
     """Get Garmin credentials from config, 1Password, or environment."""
     garmin_config = config.get("garmin", {})
@@ -171,22 +217,24 @@ def get_credentials(config):
         password_field = op_config.get("password_field", "password")
 
         try:
-            email_ref = f"op://{vault}/{item}/{email_field}"
-            password_ref = f"op://{vault}/{item}/{password_field}"
-
-            email = subprocess.check_output(
-                ["op", "read", email_ref, "--account", account],
-                text=True
-            ).strip()
-
-            password = subprocess.check_output(
-                ["op", "read", password_ref, "--account", account],
+            # One `op item get` instead of an `op read` per field: each op
+            # invocation is a fork+exec plus a round trip to 1Password.
+            item_json = subprocess.check_output(
+                [
+                    "op", "item", "get", item,
+                    "--vault", vault,
+                    "--account", account,
+                    "--format=json",
+                ],
                 text=True
-            ).strip()
+            )
+            fields = json.loads(item_json).get("fields", [])
+            email = _op_field_value(fields, email_field)
+            password = _op_field_value(fields, password_field)
 
             if email and password:
                 return email, password
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        except (subprocess.CalledProcessError, FileNotFoundError, ValueError, AttributeError):
             pass
 
     # Fall back to environment variables
@@ -258,6 +306,16 @@ def _login_tolerating_profile(client, tokenstore, auth_error_cls):
         )
 
 
+# Default concurrency for fetch-all. GPX downloads are dominated by
+# Garmin's HTTPS round trips, so a handful of threads overlap the latency
+# almost linearly without hammering the API.
+DEFAULT_FETCH_WORKERS = 8
+
+# Hard ceiling on concurrent downloads, whatever --workers says. Beyond
+# this the extra threads only queue on Garmin's per-client rate limit.
+MAX_FETCH_WORKERS = 16
+
+
 def connect_garmin(config):
     """Connect to Garmin and return client."""
     email, password, tokenstore = get_credentials_from_stdin()
@@ -277,6 +335,93 @@ def connect_garmin(config):
         sys.exit(1)
 
 
+@dataclass(frozen=True, slots=True)
+class Activity:
+    """One listed activity, as emitted by `list --json`.
+
+    Slotted: long backfills hold thousands of these, and a slotted record
+    is a fraction of the size of the equivalent dict.
+    """
+
+    id: int
+    name: str
+    type: str
+    parent_type_id: int | None
+    date: str
+    start_time: str
+    start_lat: float
+    start_lng: float
+    end_lat: float
+    end_lng: float
+    duration: float
+    distance: float
+
+
+def _select_activities(activities, stats, include_all=False, match_by_name=False):
+    """Yield an Activity for each activity that passes the filter.
+
+    See list_activities for the filter semantics. `stats` accumulates the
+    DIAGNOSTICS counters across calls, so paged listings can report once.
+    """
+    # Bound methods and globals aliased to locals: this loop runs once per
+    # activity Garmin returns, which is thousands on a long --days backfill.
+    see_type_key = stats["type_keys_seen"].add
+    water_sport = is_water_sport
+    by_name = name_matches_water_sport if match_by_name else None
+    # Counted in locals and written to `stats` once, when the generator
+    # finishes (or is closed), rather than a dict update per activity.
+    raw_count = 0
+    name_matched_count = 0
+    try:
+        for activity in activities:
+            raw_count += 1
+            get = activity.get
+            # Look each nested field up once; the same values feed the
+            # diagnostics, the filter and the output record.
+            atype = get("activityType", {}) or {}
+            type_key = atype.get("typeKey", "")
+            if type_key:
+                see_type_key(type_key)
+            if not include_all:
+                if not water_sport(activity):
+                    if not (by_name and by_name(activity)):
+                        continue
+                    name_matched_count += 1
+            start_time = get("startTimeLocal") or ""
+            yield Activity(
+                id=activity["activityId"],
+                name=get("activityName", "Unnamed"),
+                type=type_key,
+                parent_type_id=atype.get("parentTypeId"),
+                date=start_time[:10],
+                start_time=start_time,
+                start_lat=get("startLatitude", 0),
+                start_lng=get("startLongitude", 0),
+                end_lat=get("endLatitude", 0),
+                end_lng=get("endLongitude", 0),
+                duration=get("duration", 0),
+                distance=get("distance", 0),
+            )
+    finally:
+        stats["raw_count"] += raw_count
+        stats["name_matched_count"] += name_matched_count
+
+
+def _new_diagnostics():
+    return {"raw_count": 0, "type_keys_seen": set(), "name_matched_count": 0}
+
+
+def _print_diagnostics(stats):
+    print(
+        "DIAGNOSTICS: " + json.dumps({
+            "raw_count": stats["raw_count"],
+            "type_keys_seen": sorted(stats["type_keys_seen"]),
+            "name_matched_count": stats["name_matched_count"],
+        }),
+        file=sys.stderr,
+    )
+
+
 def list_activities(client, days=30, include_all=False, match_by_name=False):
     """List activities from the last N days.
 
@@ -295,65 +440,298 @@ def list_activities(client, days=30, include_all=False, match_by_name=False):
     The Go caller in internal/garmin/python.go scans for this marker; it is
     best-effort, so a missing/malformed line must not break the sync.
     """
-    start_date = datetime.now() - timedelta(days=days)
-
+    # One clock read, so start and end can't straddle midnight.
+    today = datetime.now()
     activities = client.get_activities_by_date(
-        start_date.strftime("%Y-%m-%d"),
-        datetime.now().strftime("%Y-%m-%d")
+        (today - timedelta(days=days)).strftime("%Y-%m-%d"),
+        today.strftime("%Y-%m-%d"),
     )
 
-    raw_type_keys = set()
-    name_matched_count = 0
-    out = []
-    for activity in activities:
-        atype = activity.get("activityType", {}) or {}
-        if t := atype.get("typeKey"):
-            raw_type_keys.add(t)
-        if not include_all:
-            if not is_water_sport(activity):
-                if not (match_by_name and name_matches_water_sport(activity)):
-                    continue
-                name_matched_count += 1
-        out.append({
-            "id": activity["activityId"],
-            "name": activity.get("activityName", "Unnamed"),
-            "type": atype.get("typeKey", ""),
-            "parent_type_id": atype.get("parentTypeId"),
-            "date": activity.get("startTimeLocal", "")[:10],
-            "start_time": activity.get("startTimeLocal", ""),
-            "start_lat": activity.get("startLatitude", 0),
-            "start_lng": activity.get("startLongitude", 0),
-            "end_lat": activity.get("endLatitude", 0),
-            "end_lng": activity.get("endLongitude", 0),
-            "duration": activity.get("duration", 0),
-            "distance": activity.get("distance", 0),
-        })
-
-    print(
-        "DIAGNOSTICS: " + json.dumps({
-            "raw_count": len(activities),
-            "type_keys_seen": sorted(raw_type_keys),
-            "name_matched_count": name_matched_count,
-        }),
-        file=sys.stderr,
-    )
+    stats = _new_diagnostics()
+    out = list(_select_activities(
+        activities, stats, include_all=include_all, match_by_name=match_by_name,
+    ))
+    _print_diagnostics(stats)
 
     return out
 
 
-def fetch_gpx(client, activity_id, output_dir="."):
-    """Fetch GPX file for an activity."""
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+# Page size for iter_activities. Garmin caps a single page at 1000.
+ACTIVITY_PAGE_SIZE = 100
+
+
+def iter_activities(client, days=30, include_all=False, match_by_name=False):
+    """Like list_activities, but yields records page by page.
+
+    Pages come from client.get_activities(start, limit), newest first, and
+    paging stops at the first activity dated before the cutoff (records
+    without a start time are skipped). fetch-all feeds this straight into
+    the download pool, so the first page's GPX downloads run while later
+    pages are still being listed. The DIAGNOSTICS line is printed once the
+    listing is exhausted.
+    """
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    stats = _new_diagnostics()
+    start = 0
+    while True:
+        page = client.get_activities(start, ACTIVITY_PAGE_SIZE) or []
+        in_range = []
+        past_cutoff = False
+        for activity in page:
+            date = (activity.get("startTimeLocal") or "")[:10]
+            if not date:
+                # Undated records say nothing about where the range ends.
+                continue
+            if date < cutoff:
+                past_cutoff = True
+                break
+            in_range.append(activity)
+        yield from _select_activities(
+            in_range, stats, include_all=include_all, match_by_name=match_by_name,
+        )
+        if past_cutoff or len(page) < ACTIVITY_PAGE_SIZE:
+            break
+        start += ACTIVITY_PAGE_SIZE
+    _print_diagnostics(stats)
+
+
+# Where `--cache-ttl` keeps activity listings. Entries are keyed by account
+# and filter flags (see _list_cache_path) so one user never sees another
+# user's activities.
+LIST_CACHE_DIR = Path.home() / ".cache" / "efb-connector"
+
+
+def _list_cache_path(client, days, include_all, match_by_name):
+    key = json.dumps([
+        getattr(client, "username", "") or "",
+        days,
+        include_all,
+        match_by_name,
+        datetime.now().strftime("%Y-%m-%d"),
+    ])
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return LIST_CACHE_DIR / f"list_{days}_{digest}.json"
+
+
+def list_activities_cached(client, days=30, include_all=False, match_by_name=False, ttl=0):
+    """list_activities, reusing a listing written less than `ttl` seconds ago.
+
+    ttl <= 0 disables the cache. That is the default, because the Go server
+    must always see fresh listings (and their DIAGNOSTICS line). The cache is
+    meant for interactive re-runs of `list` / `fetch-all`. Cache read and
+    write failures fall back to a live listing.
+    """
+    if ttl <= 0:
+        return list_activities(client, days, include_all=include_all, match_by_name=match_by_name)
+
+    path = _list_cache_path(client, days, include_all, match_by_name)
+    try:
+        if time.time() - path.stat().st_mtime < ttl:
+            with open(path) as f:
+                return [Activity(**a) for a in json.load(f)]
+    except (OSError, ValueError, TypeError):
+        pass
+
+    activities = list_activities(client, days, include_all=include_all, match_by_name=match_by_name)
+    try:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(_dumps(activities))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return activities
+
+
+# fetch-all --compress choices, mapped to the suffix added after ".gpx".
+# GPX is verbose XML and typically shrinks 70-90% under gzip.
+GPX_COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz"}
+
+
+def _gpx_path(output_dir, activity_id, compress="none"):
+    suffix = GPX_COMPRESSION_SUFFIXES[compress]
+    return Path(output_dir) / f"activity_{activity_id}.gpx{suffix}"
 
+
+def _gpx_meta_path(filepath):
+    """Sidecar recording a completed download, keyed on the full file name
+    (activity_<id>.gpx.meta.json, activity_<id>.gpx.gz.meta.json), so each
+    compression variant keeps its own size."""
+    return filepath.with_name(filepath.name + ".meta.json")
+
+
+def _downloaded_activity_ids(output_dir, compress="none"):
+    """IDs of activities with a completed download in output_dir, stored
+    with the given compression.
+
+    One directory scan finds the candidates (an ID with both a sidecar and
+    a file); each candidate is then confirmed with _cached_gpx, so fetch-all
+    skips exactly what fetch_gpx would serve from disk.
+    """
+    names = {p.name for p in Path(output_dir).glob("activity_*")}
+    meta_suffix = ".gpx" + GPX_COMPRESSION_SUFFIXES[compress] + ".meta.json"
+    ids = set()
+    for name in names:
+        if not name.endswith(meta_suffix):
+            continue
+        if name[:-len(".meta.json")] not in names:
+            continue
+        try:
+            activity_id = int(name[len("activity_"):-len(meta_suffix)])
+        except ValueError:
+            continue
+        if _cached_gpx(_gpx_path(output_dir, activity_id, compress)):
+            ids.add(activity_id)
+    return ids
+
+
+def _cached_gpx(filepath):
+    """True if filepath holds a complete earlier download.
+
+    Garmin's GPX export is immutable per activity ID, so a file whose size
+    matches its sidecar can be reused as-is. The sidecar is written only
+    after the GPX itself, so a download interrupted mid-write (no sidecar,
+    or a size mismatch) is fetched again.
+    """
     try:
-        gpx_data = client.download_activity(activity_id, dl_fmt=client.ActivityDownloadFormat.GPX)
+        with open(_gpx_meta_path(filepath)) as f:
+            meta = json.load(f)
+        return filepath.stat().st_size == meta.get("size")
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def _write_gpx_meta(filepath, size, sha256):
+    meta = {
+        "sha256": sha256,
+        "size": size,
+        "fetched_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    _gpx_meta_path(filepath).write_text(json.dumps(meta))
+
+
+# Chunk size for streaming GPX downloads to disk.
+GPX_CHUNK_SIZE = 64 * 1024
+
+# Garmin's GPX export endpoint (relative to connectapi). The format is
+# always GPX here, so the path is fixed up front instead of going through
+# download_activity()'s per-call format -> URL table.
+GPX_DOWNLOAD_PATH = "/download-service/export/gpx/activity/{activity_id}"
 
-        filename = f"activity_{activity_id}.gpx"
-        filepath = output_path / filename
 
-        with open(filepath, "wb") as f:
-            f.write(gpx_data)
+def _stream_gpx(client, activity_id, filepath, compress="none"):
+    """Download an activity's GPX export straight to filepath, gzipping it
+    on the fly when compress="gzip".
+
+    client.download_activity() returns the whole export as one bytes object,
+    and long activities can be tens of MB of XML. That buffer is the python
+    memory spike behind the nightly-sync OOM (see fly.toml). Streaming in
+    GPX_CHUNK_SIZE pieces keeps each download at O(chunk) memory. The file is
+    written under a .part name and renamed once complete, so a failed
+    download never leaves a truncated GPX behind.
+
+    Goes through the native client's request path (rather than
+    download_activity) so token refresh and error handling match the
+    library's own download(). Returns (size on disk, sha256 of the
+    uncompressed GPX).
+    """
+    path = GPX_DOWNLOAD_PATH.format(activity_id=activity_id)
+    # Known limitation of the private _run_request: on a 401 it refreshes
+    # and re-requests without closing the first (streamed) response, so
+    # that connection is dropped instead of returned to the pool. Expiring
+    # tokens are refreshed before the request is sent (see
+    # _serialize_token_refresh), so this only happens when Garmin revokes
+    # a token early.
+    resp = client.client._run_request("GET", path, headers={"Accept": "*/*"}, stream=True)
+    if not hasattr(resp, "iter_content"):
+        # The native client maps 204 to a body-less stand-in response.
+        raise RuntimeError(f"empty GPX response (status {resp.status_code})")
+
+    digest = hashlib.sha256()
+    part = filepath.with_name(filepath.name + ".part")
+    try:
+        with open(part, "wb") as raw:
+            if compress == "gzip":
+                import gzip
+
+                sink = gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=6, mtime=0)
+            else:
+                sink = contextlib.nullcontext(raw)
+            with sink as f:
+                for chunk in resp.iter_content(GPX_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+            size = raw.tell()
+        os.replace(part, filepath)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    finally:
+        resp.close()
+    return size, digest.hexdigest()
+
+
+# Retry policy for GPX downloads. A transient 429/5xx or dropped connection
+# is retried with exponential backoff plus jitter (1s, 2s, 4s, ... capped),
+# so one hiccup doesn't drop the activity from the run. Kept short: the Go
+# caller paces users and has its own rate-limit backoff.
+GPX_DOWNLOAD_ATTEMPTS = 5
+GPX_RETRY_MAX_DELAY = 30
+
+# garminconnect's native client reports HTTP failures as "API Error <status>".
+_API_ERROR_STATUS = re.compile(r"API Error (\d{3})")
+
+
+def _is_transient(exc):
+    """True for download failures worth retrying: HTTP 429/5xx and
+    network-level errors. Other 4xx (no GPX, auth) fail immediately."""
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is None:
+        if m := _API_ERROR_STATUS.search(str(exc)):
+            status = int(m.group(1))
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    # requests' exceptions are OSErrors carrying the failed request; local
+    # file errors (disk full, permissions) are not and aren't retried.
+    return isinstance(exc, OSError) and hasattr(exc, "request")
+
+
+def _retry_delay(attempt):
+    """Seconds to wait before retry number `attempt` (1-based)."""
+    import random
+
+    return min(GPX_RETRY_MAX_DELAY, 2 ** (attempt - 1)) + random.random()
+
+
+def fetch_gpx(client, activity_id, output_dir=".", force=False, compress="none"):
+    """Fetch GPX file for an activity into output_dir, which must exist.
+
+    An earlier complete download in output_dir is reused without touching
+    the network unless force=True. Transient failures are retried (see
+    GPX_DOWNLOAD_ATTEMPTS). compress="gzip" stores activity_<id>.gpx.gz.
+    """
+    filepath = _gpx_path(output_dir, activity_id, compress)
+    if not force and _cached_gpx(filepath):
+        return str(filepath)
+
+    try:
+        for attempt in range(1, GPX_DOWNLOAD_ATTEMPTS + 1):
+            try:
+                size, sha256 = _stream_gpx(client, activity_id, filepath, compress)
+                break
+            except Exception as e:
+                if attempt == GPX_DOWNLOAD_ATTEMPTS or not _is_transient(e):
+                    raise
+                delay = _retry_delay(attempt)
+                print(
+                    f"Retrying GPX for activity {activity_id} in {delay:.1f}s "
+                    f"(attempt {attempt}/{GPX_DOWNLOAD_ATTEMPTS}): {e}",
+                    file=sys.stderr,
+                )
+                time.sleep(delay)
+        _write_gpx_meta(filepath, size, sha256)
 
         return str(filepath)
     except Exception as e:
@@ -361,6 +739,77 @@ def fetch_gpx(client, activity_id, output_dir="."):
         return None
 
 
+def _serialize_token_refresh(client):
+    """Make the shared client's token refresh safe for fetch-all workers.
+
+    garminconnect's _run_request calls _refresh_session() whenever the
+    token is within 15 minutes of expiry (and again on a 401). With one
+    client shared by the pool, every worker would then refresh at once:
+    all of them spend the same DI refresh token, and each dump()s the
+    result to the same tokenstore file, which can leave it corrupted.
+    The refresh is done once up front on the calling thread, and later
+    refreshes are serialized behind a lock; a worker that waited while
+    another one refreshed sees the new token and skips its own refresh.
+    """
+    native = getattr(client, "client", None)
+    refresh = getattr(native, "_refresh_session", None)
+    if refresh is None or getattr(refresh, "serialized", False):
+        return
+
+    import threading
+
+    lock = threading.Lock()
+
+    def serialized_refresh():
+        seen = (native.di_token, native.jwt_web)
+        with lock:
+            if (native.di_token, native.jwt_web) != seen:
+                return
+            refresh()
+
+    serialized_refresh.serialized = True
+    native._refresh_session = serialized_refresh
+
+    if native.is_authenticated and native._token_expires_soon():
+        serialized_refresh()
+
+
+def fetch_gpx_many(
+    client, activities, output_dir=".", workers=DEFAULT_FETCH_WORKERS,
+    force=False, downloaded=frozenset(), compress="none",
+):
+    """Fetch GPX files for several activities concurrently.
+
+    `activities` may be any iterable, including the lazy iter_activities.
+    Yields (activity, filepath_or_None) tuples in the same order, as soon
+    as each download (and all before it) finishes.
+    The Garmin client is shared by all workers (see
+    _serialize_token_refresh); `workers` is clamped to [1, MAX_FETCH_WORKERS].
+
+    Activities whose ID is in `downloaded` (see _downloaded_activity_ids)
+    are reported with their existing file and never reach the pool.
+    """
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+    _serialize_token_refresh(client)
+    workers = min(max(1, workers), MAX_FETCH_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        # Submitting as `activities` is consumed (rather than ex.map over a
+        # list) lets downloads start while a lazy listing is still paging.
+        futures = []
+        for act in activities:
+            if act.id in downloaded:
+                future = Future()
+                future.set_result(str(_gpx_path(output_dir, act.id, compress)))
+            else:
+                future = ex.submit(
+                    fetch_gpx, client, act.id, output_dir, force=force, compress=compress,
+                )
+            futures.append((act, future))
+        for act, future in futures:
+            yield act, future.result()
+
+
 def validate_credentials(config):
     """Validate Garmin credentials and report the result as JSON.
 
@@ -495,6 +944,10 @@ def main():
     list_parser = subparsers.add_parser("list", help="List water sport activities")
     list_parser.add_argument("--days", type=int, default=30, help="Number of days to look back (default: 30)")
     list_parser.add_argument("--json", action="store_true", help="Output as JSON")
+    list_parser.add_argument(
+        "--cache-ttl", type=int, default=0,
+        help="Reuse a listing cached less than N seconds ago (default: 0, disabled)",
+    )
     list_parser.add_argument(
         "--no-filter", action="store_true",
         help="Return every activity (operator diagnostic mode, bypasses water-sport filter)",
@@ -509,12 +962,26 @@ def main():
     fetch_parser = subparsers.add_parser("fetch", help="Fetch GPX for a specific activity")
     fetch_parser.add_argument("activity_id", type=int, help="Activity ID to fetch")
     fetch_parser.add_argument("--output", "-o", default=".", help="Output directory (default: current)")
+    fetch_parser.add_argument("--force", action="store_true", help="Re-download even if already fetched")
 
     # Fetch-all command
     fetch_all_parser = subparsers.add_parser("fetch-all", help="Fetch GPX for all water sport activities")
     fetch_all_parser.add_argument("--days", type=int, default=30, help="Number of days to look back (default: 30)")
     fetch_all_parser.add_argument("--output", "-o", default=".", help="Output directory (default: current)")
     fetch_all_parser.add_argument("--json", action="store_true", help="Output results as JSON")
+    fetch_all_parser.add_argument(
+        "--cache-ttl", type=int, default=0,
+        help="Reuse a listing cached less than N seconds ago (default: 0, disabled)",
+    )
+    fetch_all_parser.add_argument(
+        "--workers", type=int, default=DEFAULT_FETCH_WORKERS,
+        help=f"Number of concurrent downloads (default: {DEFAULT_FETCH_WORKERS}, max: {MAX_FETCH_WORKERS})",
+    )
+    fetch_all_parser.add_argument("--force", action="store_true", help="Re-download even if already fetched")
+    fetch_all_parser.add_argument(
+        "--compress", choices=sorted(GPX_COMPRESSION_SUFFIXES), default="none",
+        help="Store GPX files compressed (gzip writes activity_<id>.gpx.gz; default: none)",
+    )
 
     # Validate command
     subparsers.add_parser("validate", help="Validate Garmin credentials")
@@ -541,14 +1008,15 @@ def main():
     client = connect_garmin(config)
 
     if args.command == "list":
-        activities = list_activities(
+        activities = list_activities_cached(
             client, args.days,
             include_all=args.no_filter,
             match_by_name=args.match_by_name,
+            ttl=args.cache_ttl,
         )
 
         if args.json:
-            print(json.dumps(activities))
+            print(_dumps(activities))
         else:
             if not activities:
                 print(f"No water sport activities found in the last {args.days} days.")
@@ -556,43 +1024,63 @@ def main():
                 print(f"Water sport activities (last {args.days} days):")
                 print("-" * 60)
                 for act in activities:
-                    duration_min = int(act["duration"] / 60) if act["duration"] else 0
-                    distance_km = act["distance"] / 1000 if act["distance"] else 0
-                    print(f"  {act['id']}: {act['date']} - {act['name']}")
-                    print(f"           Type: {act['type']}, {duration_min} min, {distance_km:.1f} km")
+                    duration_min = int(act.duration / 60) if act.duration else 0
+                    distance_km = act.distance / 1000 if act.distance else 0
+                    print(f"  {act.id}: {act.date} - {act.name}")
+                    print(f"           Type: {act.type}, {duration_min} min, {distance_km:.1f} km")
 
     elif args.command == "fetch":
-        filepath = fetch_gpx(client, args.activity_id, args.output)
+        output_dir = Path(args.output)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        filepath = fetch_gpx(client, args.activity_id, output_dir, force=args.force)
         if filepath:
             print(filepath)
         else:
             sys.exit(1)
 
     elif args.command == "fetch-all":
-        activities = list_activities(client, args.days)
+        # Created once here rather than by every download task.
+        output_dir = Path(args.output)
+        output_dir.mkdir(parents=True, exist_ok=True)
 
-        if not activities:
-            if args.json:
-                print(json.dumps([]))
-            else:
-                print(f"No water sport activities found in the last {args.days} days.")
-            return
+        if args.cache_ttl > 0:
+            activities = list_activities_cached(client, args.days, ttl=args.cache_ttl)
+        else:
+            # Lazy, paged listing: downloads start with the first page.
+            activities = iter_activities(client, args.days)
+
+        # Checked once up front, so already-downloaded activities never
+        # become pool tasks.
+        downloaded = frozenset() if args.force else _downloaded_activity_ids(output_dir, args.compress)
 
+        # Output is printed from the main thread as results arrive in order,
+        # so worker threads never interleave stdout.
         results = []
-        for act in activities:
-            filepath = fetch_gpx(client, act["id"], args.output)
+        found = False
+        skipped = 0
+        for act, filepath in fetch_gpx_many(
+            client, activities, output_dir, args.workers,
+            force=args.force, downloaded=downloaded, compress=args.compress,
+        ):
+            found = True
             if filepath:
                 results.append({
-                    "id": act["id"],
-                    "name": act["name"],
-                    "date": act["date"],
+                    "id": act.id,
+                    "name": act.name,
+                    "date": act.date,
                     "file": filepath
                 })
-                if not args.json:
+                if act.id in downloaded:
+                    skipped += 1
+                elif not args.json:
                     print(f"Downloaded: {filepath}")
 
         if args.json:
-            print(json.dumps(results))
+            print(_dumps(results))
+        elif not found:
+            print(f"No water sport activities found in the last {args.days} days.")
+        elif skipped:
+            print(f"Skipped {skipped} already downloaded.")
 
 
 if __name__ == "__main__":
@@ -14,10 +14,14 @@ or simply:
 """
 
 import contextlib
+import gzip
 import io
 import json
+import os
+import sys
 import tempfile
 import unittest
+from types import SimpleNamespace
 from unittest import mock
 
 from scripts import garmin_fetch as gf
@@ -165,7 +169,7 @@ class ListActivitiesFilteringTest(unittest.TestCase):
 
     def test_strict_mode_keeps_only_water_sport(self):
         out = gf.list_activities(self._FakeClient(self._make_activities()), days=30)
-        self.assertEqual([a["id"] for a in out], [1])
+        self.assertEqual([a.id for a in out], [1])
 
     def test_match_by_name_recovers_mistagged(self):
         out = gf.list_activities(
@@ -173,7 +177,7 @@ class ListActivitiesFilteringTest(unittest.TestCase):
             days=30,
             match_by_name=True,
         )
-        self.assertEqual([a["id"] for a in out], [1, 2])
+        self.assertEqual([a.id for a in out], [1, 2])
 
     def test_include_all_returns_everything(self):
         out = gf.list_activities(
@@ -181,7 +185,471 @@ class ListActivitiesFilteringTest(unittest.TestCase):
             days=30,
             include_all=True,
         )
-        self.assertEqual([a["id"] for a in out], [1, 2, 3])
+        self.assertEqual([a.id for a in out], [1, 2, 3])
+
+
+class _FakeGpxResponse:
+    """Streaming response stand-in for the native client's _run_request."""
+
+    status_code = 200
+
+    def __init__(self, body, fail_after=None):
+        self._body = body
+        self._fail_after = fail_after
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self._body), chunk_size):
+            if self._fail_after is not None and i >= self._fail_after:
+                raise ConnectionError("connection reset")
+            yield self._body[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def _gpx_client(body=None, failing=()):
+    """Fake Garmin client serving GPX downloads through client.client._run_request.
+    Activity IDs in `failing` raise; otherwise the body is `body` or a
+    per-activity stub document."""
+    client = mock.Mock(name="GarminClient")
+
+    def run_request(_method, path, **_kwargs):
+        activity_id = int(path.rsplit("/", 1)[1])
+        if activity_id in failing:
+            raise RuntimeError("boom")
+        return _FakeGpxResponse(body if body is not None else f"<gpx id='{activity_id}'/>".encode())
+
+    client.client._run_request.side_effect = run_request
+    return client
+
+
+class FetchGpxManyTest(unittest.TestCase):
+    """fetch-all downloads concurrently but must report in listing order."""
+
+    def test_results_keep_input_order(self):
+        activities = [SimpleNamespace(id=i) for i in range(1, 21)]
+        with tempfile.TemporaryDirectory() as out, contextlib.redirect_stderr(io.StringIO()):
+            results = list(gf.fetch_gpx_many(_gpx_client(failing={7}), activities, out, workers=4))
+        self.assertEqual([act.id for act, _ in results], list(range(1, 21)))
+        self.assertIsNone(results[6][1])
+        self.assertTrue(results[0][1].endswith("activity_1.gpx"))
+
+
+class SerializeTokenRefreshTest(unittest.TestCase):
+    """Workers sharing one client must not refresh the token concurrently."""
+
+    class _Native:
+        is_authenticated = True
+
+        def __init__(self, expiring):
+            self.di_token = "old"
+            self.jwt_web = None
+            self.expiring = expiring
+            self.refreshes = 0
+            self.active = 0
+            self.overlapped = False
+
+        def _token_expires_soon(self):
+            return self.expiring
+
+        def _refresh_session(self):
+            self.active += 1
+            self.overlapped |= self.active > 1
+            gf.time.sleep(0.01)
+            self.refreshes += 1
+            self.di_token = f"new{self.refreshes}"
+            self.expiring = False
+            self.active -= 1
+
+    def test_expiring_token_refreshed_once_up_front(self):
+        client = SimpleNamespace(client=self._Native(expiring=True))
+        gf._serialize_token_refresh(client)
+        self.assertEqual(client.client.refreshes, 1)
+
+    def test_concurrent_refreshes_collapse_to_one(self):
+        import threading
+
+        native = self._Native(expiring=False)
+        gf._serialize_token_refresh(SimpleNamespace(client=native))
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            native._refresh_session()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertFalse(native.overlapped)
+        self.assertLess(native.refreshes, 8)
+
+
+class FetchGpxCacheTest(unittest.TestCase):
+    """GPX exports are immutable per activity ID; complete earlier
+    downloads are reused instead of hitting Garmin again."""
+
+    def setUp(self):
+        self.client = _gpx_client(body=b"<gpx/>")
+        self.downloads = self.client.client._run_request
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.out = tmp.name
+
+    def test_second_fetch_is_served_from_disk(self):
+        first = gf.fetch_gpx(self.client, 42, self.out)
+        second = gf.fetch_gpx(self.client, 42, self.out)
+        self.assertEqual(first, second)
+        self.assertEqual(self.downloads.call_count, 1)
+
+    def test_force_redownloads(self):
+        gf.fetch_gpx(self.client, 42, self.out)
+        gf.fetch_gpx(self.client, 42, self.out, force=True)
+        self.assertEqual(self.downloads.call_count, 2)
+
+    def test_truncated_file_is_redownloaded(self):
+        path = gf.fetch_gpx(self.client, 42, self.out)
+        with open(path, "wb") as f:
+            f.write(b"<g")
+        gf.fetch_gpx(self.client, 42, self.out)
+        self.assertEqual(self.downloads.call_count, 2)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"<gpx/>")
+
+    def test_file_without_sidecar_is_redownloaded(self):
+        with open(f"{self.out}/activity_42.gpx", "wb") as f:
+            f.write(b"<gpx/>")
+        gf.fetch_gpx(self.client, 42, self.out)
+        self.assertEqual(self.downloads.call_count, 1)
+
+
+class DownloadedActivityIdsTest(unittest.TestCase):
+    """fetch-all skips completed downloads before dispatching to the pool."""
+
+    def test_only_completed_downloads_are_skipped(self):
+        client = _gpx_client()
+        with tempfile.TemporaryDirectory() as out:
+            gf.fetch_gpx(client, 1, out)
+            # A GPX without sidecar is not a completed download.
+            with open(f"{out}/activity_2.gpx", "wb") as f:
+                f.write(b"<gpx/>")
+            # Nor is one whose size no longer matches its sidecar.
+            gf.fetch_gpx(client, 3, out)
+            with open(f"{out}/activity_3.gpx", "ab") as f:
+                f.write(b"garbage")
+            downloaded = gf._downloaded_activity_ids(out)
+            self.assertEqual(downloaded, {1})
+
+            results = list(gf.fetch_gpx_many(
+                client, [SimpleNamespace(id=1), SimpleNamespace(id=2)], out, downloaded=downloaded,
+            ))
+        self.assertEqual([act.id for act, _ in results], [1, 2])
+        self.assertTrue(results[0][1].endswith("activity_1.gpx"))
+        # Initial fetches of 1 and 3, then 2; 1 is not re-fetched.
+        self.assertEqual(client.client._run_request.call_count, 3)
+
+
+class FetchGpxCompressTest(unittest.TestCase):
+    """fetch-all --compress gzip stores activity_<id>.gpx.gz."""
+
+    def test_gzip_roundtrip_and_cache(self):
+        body = b"<gpx>" + b"<trkpt/>" * 20000 + b"</gpx>"
+        client = _gpx_client(body=body)
+        with tempfile.TemporaryDirectory() as out:
+            path = gf.fetch_gpx(client, 5, out, compress="gzip")
+            self.assertTrue(path.endswith("activity_5.gpx.gz"))
+            with gzip.open(path, "rb") as f:
+                self.assertEqual(f.read(), body)
+            self.assertLess(os.path.getsize(path), len(body) // 10)
+
+            # Served from disk on the next run with the same compression...
+            gf.fetch_gpx(client, 5, out, compress="gzip")
+            self.assertEqual(client.client._run_request.call_count, 1)
+            self.assertEqual(gf._downloaded_activity_ids(out, "gzip"), {5})
+            # ...but not counted as downloaded for an uncompressed run.
+            self.assertEqual(gf._downloaded_activity_ids(out), set())
+
+    def test_alternating_compression_keeps_both_cached(self):
+        client = _gpx_client(body=b"<gpx>" + b"<trkpt/>" * 1000 + b"</gpx>")
+        with tempfile.TemporaryDirectory() as out:
+            for compress in ("none", "gzip", "none", "gzip"):
+                gf.fetch_gpx(client, 5, out, compress=compress)
+            # One download per variant; later runs hit their own sidecar.
+            self.assertEqual(client.client._run_request.call_count, 2)
+            self.assertEqual(gf._downloaded_activity_ids(out), {5})
+            self.assertEqual(gf._downloaded_activity_ids(out, "gzip"), {5})
+
+
+class FetchGpxStreamingTest(unittest.TestCase):
+    """GPX bytes are streamed to disk in chunks, never half-written."""
+
+    def test_multi_chunk_body_written_intact(self):
+        body = b"<gpx>" + b"x" * (gf.GPX_CHUNK_SIZE * 3 + 17) + b"</gpx>"
+        with tempfile.TemporaryDirectory() as out:
+            path = gf.fetch_gpx(_gpx_client(body=body), 5, out)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), body)
+
+    def test_requests_gpx_export_path(self):
+        client = _gpx_client()
+        with tempfile.TemporaryDirectory() as out:
+            gf.fetch_gpx(client, 5, out)
+        method, path = client.client._run_request.call_args.args
+        self.assertEqual((method, path), ("GET", "/download-service/export/gpx/activity/5"))
+        self.assertTrue(client.client._run_request.call_args.kwargs["stream"])
+
+    def test_failed_stream_leaves_no_file(self):
+        client = mock.Mock(name="GarminClient")
+        resp = _FakeGpxResponse(b"x" * (gf.GPX_CHUNK_SIZE * 2), fail_after=gf.GPX_CHUNK_SIZE)
+        client.client._run_request.return_value = resp
+        with tempfile.TemporaryDirectory() as out, contextlib.redirect_stderr(io.StringIO()), \
+                mock.patch.object(gf.time, "sleep"):
+            self.assertIsNone(gf.fetch_gpx(client, 5, out))
+            self.assertEqual(os.listdir(out), [])
+        self.assertTrue(resp.closed)
+
+
+class FetchGpxRetryTest(unittest.TestCase):
+    """Transient download failures are retried with backoff."""
+
+    def setUp(self):
+        patcher = mock.patch.object(gf.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.out = tmp.name
+
+    def _client(self, *outcomes):
+        client = mock.Mock(name="GarminClient")
+        client.client._run_request.side_effect = list(outcomes)
+        return client
+
+    def _fetch(self, client):
+        with contextlib.redirect_stderr(io.StringIO()):
+            return gf.fetch_gpx(client, 5, self.out)
+
+    def test_rate_limit_then_success(self):
+        client = self._client(
+            RuntimeError("API Error 429 - Too Many Requests"),
+            RuntimeError("API Error 503"),
+            _FakeGpxResponse(b"<gpx/>"),
+        )
+        self.assertIsNotNone(self._fetch(client))
+        self.assertEqual(client.client._run_request.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        # Exponential: 1s + jitter, then 2s + jitter.
+        first, second = (c.args[0] for c in self.sleep.call_args_list)
+        self.assertTrue(1 <= first < 2 and 2 <= second < 3)
+
+    def test_not_found_is_not_retried(self):
+        client = self._client(RuntimeError("API Error 404 - Not Found"))
+        self.assertIsNone(self._fetch(client))
+        self.assertEqual(client.client._run_request.call_count, 1)
+
+    def test_gives_up_after_max_attempts(self):
+        client = self._client(*[ConnectionError("reset")] * gf.GPX_DOWNLOAD_ATTEMPTS)
+        self.assertIsNone(self._fetch(client))
+        self.assertEqual(client.client._run_request.call_count, gf.GPX_DOWNLOAD_ATTEMPTS)
+
+
+class ListActivitiesCacheTest(unittest.TestCase):
+    """--cache-ttl reuses a fresh listing, per account."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(gf, "LIST_CACHE_DIR", gf.Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _client(self, username):
+        client = mock.Mock(name="GarminClient")
+        client.username = username
+        client.get_activities_by_date.return_value = [{
+            "activityId": 1,
+            "activityName": "Kajak",
+            "activityType": {"typeKey": "kayaking_v2", "parentTypeId": 228},
+            "startTimeLocal": "2026-05-30 14:00:00",
+        }]
+        return client
+
+    def _list(self, client, ttl):
+        with contextlib.redirect_stderr(io.StringIO()):
+            return gf.list_activities_cached(client, days=30, ttl=ttl)
+
+    def test_fresh_listing_is_reused(self):
+        client = self._client("a@example.com")
+        first = self._list(client, ttl=300)
+        second = self._list(client, ttl=300)
+        self.assertEqual(first, second)
+        self.assertEqual(client.get_activities_by_date.call_count, 1)
+
+    def test_zero_ttl_always_lists(self):
+        client = self._client("a@example.com")
+        self._list(client, ttl=0)
+        self._list(client, ttl=0)
+        self.assertEqual(client.get_activities_by_date.call_count, 2)
+
+    def test_cache_is_per_account(self):
+        self._list(self._client("a@example.com"), ttl=300)
+        other = self._client("b@example.com")
+        self._list(other, ttl=300)
+        self.assertEqual(other.get_activities_by_date.call_count, 1)
+
+
+class LoadConfigTest(unittest.TestCase):
+    """config.json is returned as the parsed object."""
+
+    def test_reads_config_from_working_directory(self):
+        config = {"garmin": {"onepassword": {"account": "me", "item": "Garmin"}}}
+        with tempfile.TemporaryDirectory() as cwd:
+            with open(os.path.join(cwd, "config.json"), "w") as f:
+                json.dump(config, f)
+            prev = os.getcwd()
+            os.chdir(cwd)
+            try:
+                self.assertEqual(gf.load_config(), config)
+            finally:
+                os.chdir(prev)
+
+    def test_no_config_anywhere(self):
+        with tempfile.TemporaryDirectory() as cwd, \
+                mock.patch.object(gf.Path, "home", return_value=gf.Path(cwd)):
+            prev = os.getcwd()
+            os.chdir(cwd)
+            try:
+                self.assertEqual(gf.load_config(), {})
+            finally:
+                os.chdir(prev)
+
+
+class OnePasswordCredentialsTest(unittest.TestCase):
+    """1Password credentials come from a single `op item get` call."""
+
+    CONFIG = {"garmin": {"onepassword": {"account": "me", "item": "Garmin"}}}
+
+    ITEM = json.dumps({"fields": [
+        {"id": "username", "label": "username", "value": "e@example.com"},
+        {"id": "password", "label": "password", "value": "pw"},
+        {"id": "notesPlain", "label": "notesPlain", "value": ""},
+    ]})
+
+    def test_single_op_call_yields_both_fields(self):
+        with mock.patch("subprocess.check_output", return_value=self.ITEM) as op:
+            self.assertEqual(gf.get_credentials(self.CONFIG), ("e@example.com", "pw"))
+        self.assertEqual(op.call_count, 1)
+        self.assertEqual(op.call_args[0][0][:4], ["op", "item", "get", "Garmin"])
+
+    def test_section_qualified_field_names(self):
+        item = json.dumps({"fields": [
+            {"id": "username", "label": "username", "value": "login@example.com"},
+            {"id": "password", "label": "password", "value": "pw"},
+            {"id": "abc", "label": "username", "value": "garmin@example.com",
+             "section": {"id": "s1", "label": "Garmin"}},
+        ]})
+        config = {"garmin": {"onepassword": {
+            "account": "me", "item": "Garmin", "email_field": "Garmin/username",
+        }}}
+        with mock.patch("subprocess.check_output", return_value=item):
+            self.assertEqual(gf.get_credentials(config), ("garmin@example.com", "pw"))
+
+    def test_missing_field_falls_back_to_env(self):
+        item = json.dumps({"fields": [{"id": "username", "label": "username", "value": "x"}]})
+        env = {"GARMIN_EMAIL": "env@example.com", "GARMIN_PASSWORD": "envpw"}
+        with mock.patch("subprocess.check_output", return_value=item), \
+                mock.patch.dict(gf.os.environ, env):
+            self.assertEqual(gf.get_credentials(self.CONFIG), ("env@example.com", "envpw"))
+
+
+class IterActivitiesTest(unittest.TestCase):
+    """Paged listing for the fetch-all pipeline."""
+
+    class _PagedClient:
+        def __init__(self, activities):
+            self._activities = activities
+            self.calls = []
+
+        def get_activities(self, start, limit):
+            self.calls.append((start, limit))
+            return self._activities[start:start + limit]
+
+    @staticmethod
+    def _kajak(activity_id, days_ago):
+        when = gf.datetime.now() - gf.timedelta(days=days_ago)
+        return {
+            "activityId": activity_id,
+            "activityName": "Kajak",
+            "activityType": {"typeKey": "kayaking_v2", "parentTypeId": 228},
+            "startTimeLocal": when.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def _iter(self, client, days):
+        err = io.StringIO()
+        with mock.patch.object(gf, "ACTIVITY_PAGE_SIZE", 2), contextlib.redirect_stderr(err):
+            ids = [a.id for a in gf.iter_activities(client, days=days)]
+        return ids, err.getvalue()
+
+    def test_pages_until_cutoff(self):
+        client = self._PagedClient([self._kajak(i, days_ago=i) for i in range(1, 10)])
+        ids, _ = self._iter(client, days=3)
+        self.assertEqual(ids, [1, 2, 3])
+        # Page [3, 4] crosses the cutoff, so page three is never requested.
+        self.assertEqual(client.calls, [(0, 2), (2, 2)])
+
+    def test_undated_records_are_skipped_not_treated_as_cutoff(self):
+        undated = self._kajak(2, days_ago=2)
+        undated["startTimeLocal"] = None
+        missing = self._kajak(3, days_ago=3)
+        del missing["startTimeLocal"]
+        client = self._PagedClient([
+            self._kajak(1, days_ago=1), undated, missing, self._kajak(4, days_ago=4),
+        ])
+        ids, _ = self._iter(client, days=30)
+        self.assertEqual(ids, [1, 4])
+        self.assertEqual(client.calls, [(0, 2), (2, 2), (4, 2)])
+
+    def test_stops_on_short_page_and_reports_diagnostics(self):
+        client = self._PagedClient([self._kajak(i, days_ago=i) for i in range(1, 4)])
+        ids, err = self._iter(client, days=30)
+        self.assertEqual(ids, [1, 2, 3])
+        self.assertEqual(client.calls, [(0, 2), (2, 2)])
+        diag = json.loads(err.split("DIAGNOSTICS: ", 1)[1])
+        self.assertEqual(diag["raw_count"], 3)
+
+
+class DumpsTest(unittest.TestCase):
+    """_dumps must produce the same JSON document with or without orjson."""
+
+    PAYLOAD = [{"id": 1, "name": "Münster Kajak", "parent_type_id": None, "distance": 1234.5}]
+
+    def test_roundtrip(self):
+        self.assertEqual(json.loads(gf._dumps(self.PAYLOAD)), self.PAYLOAD)
+
+    def test_stdlib_fallback(self):
+        with mock.patch.dict(sys.modules, {"orjson": None}):
+            self.assertEqual(gf._dumps(self.PAYLOAD), json.dumps(self.PAYLOAD))
+
+    def test_activity_records_encode_as_objects(self):
+        # The Go caller decodes `list --json` by key; Activity records must
+        # serialize exactly like the dicts they replaced.
+        act = gf.Activity(
+            id=1, name="Kajak", type="kayaking_v2", parent_type_id=228,
+            date="2026-05-30", start_time="2026-05-30 14:00:00",
+            start_lat=52.0, start_lng=7.6, end_lat=52.1, end_lng=7.7,
+            duration=3600.0, distance=12000.0,
+        )
+        expected = [{
+            "id": 1, "name": "Kajak", "type": "kayaking_v2", "parent_type_id": 228,
+            "date": "2026-05-30", "start_time": "2026-05-30 14:00:00",
+            "start_lat": 52.0, "start_lng": 7.6, "end_lat": 52.1, "end_lng": 7.7,
+            "duration": 3600.0, "distance": 12000.0,
+        }]
+        self.assertEqual(json.loads(gf._dumps([act])), expected)
+        with mock.patch.dict(sys.modules, {"orjson": None}):
+            self.assertEqual(json.loads(gf._dumps([act])), expected)
 
 
 class _FakeAuthError(Exception):